@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _db():
+    from show_my_solutions import dbmanager
+
+    # Tests do not need durability; an in-memory database avoids disk I/O
+    # and stale sms_test.db state between runs
+    dbmanager.start_database(name=':memory:', echo=False, testing=True)
+    yield
+    dbmanager.engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def reactor():
+    from show_my_solutions.app import get_config, Reactor
+    return Reactor(get_config())
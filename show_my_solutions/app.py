@@ -2,9 +2,15 @@ import logging
 import argparse
 import json
 import os.path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import warnings
-from .dbmanager import start_database, record_submissions, fetch_submissions, _reset_tables
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from .dbmanager import (start_database, record_submissions, fetch_submissions_by_handlers,
+                        _reset_tables)
 from .handlers import build_handler
 from .scrapers import build_scraper
 
@@ -35,27 +41,38 @@ class Reactor:
         if not self.sources:
             LOGGER.warning('No source found')
 
-        LOGGER.debug('Loaded configuration: %s', json.dumps(self.options, indent=2))
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug('Loaded configuration: %s', _dumps_pretty(self.options))
 
     def start(self):
         LOGGER.info('Reactor started')
         try:
             num_subs = 0
-            for s in self.sources:
-                subs = s.fetch()
-                LOGGER.debug('Fetched submissions: %s', subs)
-                LOGGER.info("Fetched %s submission(s) from '%s'", len(subs), s.name)
-                record_submissions(subs)
-                num_subs += len(subs)
+            if self.sources:
+                # Scraping is I/O-bound, so fetch every source concurrently.
+                # Every result is drained before the executor exits: scrapers
+                # read the latest problem id mid-fetch, and recording while a
+                # worker is still using the database could interleave with an
+                # insert transaction in flight
+                with ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
+                    fetched = list(executor.map(lambda source: source.fetch(), self.sources))
+                for s, subs in zip(self.sources, fetched):
+                    if LOGGER.isEnabledFor(logging.DEBUG):
+                        LOGGER.debug('Fetched submissions: %s', subs)
+                    LOGGER.info("Fetched %s submission(s) from '%s'", len(subs), s.name)
+                    record_submissions(subs)
+                    num_subs += len(subs)
             LOGGER.info('Fetched %s submission(s) in total', num_subs)
 
             num_ups = 0
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                subs_by_handler = fetch_submissions_by_handlers([h.name for h in self.handlers])
             for h in self.handlers:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    subs = fetch_submissions(h.name)
+                subs = subs_by_handler[h.name]
                 if subs:
-                    LOGGER.debug('Handling submissions: %s', subs)
+                    if LOGGER.isEnabledFor(logging.DEBUG):
+                        LOGGER.debug('Handling submissions: %s', subs)
                     h.upload(subs)
                     LOGGER.info("Handled %s submission(s) by '%s'", len(subs), h.name)
                     num_ups += len(subs)
@@ -91,6 +108,18 @@ def setup_logging():
     logger.setLevel(logging.INFO)
 
 
+def _loads(text):
+    if orjson:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _dumps_pretty(obj):
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('-c', '--config', metavar='path', required=False, default=None,
@@ -104,7 +133,7 @@ def get_config(config_path=None):
     config_path = './config.json' if not config_path else config_path
     try:
         with open(config_path) as fin:
-            return json.load(fin)
+            return _loads(fin.read())
     except FileNotFoundError:
         config_path = os.path.abspath(config_path)
         raise ValueError('Config file does not exist on the path: {}'.format(config_path))
@@ -121,8 +150,8 @@ def run():
     try:
         if args.reset:
             if input('Reset the internal database? [y/n]: ').startswith('y'):
-                start_database(path=ROOT_DIR)
-                _reset_tables()
+                start_database(path=ROOT_DIR, upgrade=False)
+                _reset_tables(recreate=True)
                 LOGGER.info('Database has been reset')
             else:
                 LOGGER.info('Reset aborted')
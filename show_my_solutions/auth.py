@@ -50,7 +50,13 @@ class TrelloAuth(AuthBase):
         open_new(auth_url)
         return self.listen_for_token()
 
-    def listen_for_token(self):
+    # Shared by all instances; building a Flask app and registering its
+    # routes is costly enough to only do once
+    _app = None
+    _listening = None
+
+    @classmethod
+    def _build_app(cls):
         app = Flask(__name__)
 
         @app.route('/')
@@ -60,7 +66,7 @@ class TrelloAuth(AuthBase):
         @app.route('/fragment/<token>')
         def second(token):
             LOGGER.debug('Token fetched: %s', token)
-            self.token = token
+            cls._listening.token = token
             return shutdown(True)
 
         @app.route('/<path:success>')
@@ -80,8 +86,16 @@ class TrelloAuth(AuthBase):
                     'Cannot stop listening: Flask is not running with the Werkzeug Server')
             func()
 
+        return app
+
+    def listen_for_token(self):
+        cls = type(self)
+        if cls._app is None:
+            cls._app = cls._build_app()
+
+        cls._listening = self
         self.token = None
-        app.run(*self.address)
+        cls._app.run(*self.address)
         if self.token is None:
             raise ValueError('Failed to fetch the access token')
         return self.token
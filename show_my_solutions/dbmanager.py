@@ -1,14 +1,42 @@
 import os
+import functools
 from collections.abc import Mapping
+from datetime import datetime, timedelta
+from operator import attrgetter, itemgetter
 import pytz
 from sqlalchemy import (Column, Table, MetaData, create_engine, ForeignKey, UniqueConstraint,
-                        Integer, String, func, DateTime,
-                        select, exists, union,
-                        event)
+                        Index, Integer, String, func, DateTime,
+                        select, bindparam, distinct, event, inspect)
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
 
 
-class Submission(Mapping, dict):
+@functools.lru_cache(maxsize=64)
+def _tz(name):
+    """Memoized pytz.timezone, which is costly to look up per submission."""
+    return pytz.timezone(name)
+
+
+_UTC = pytz.utc
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_epoch(submit_time):
+    """Naive utc datetime to microseconds since the epoch.
+
+    Integer arithmetic on the timedelta keeps the conversion exact, unlike
+    going through a float timestamp.
+    """
+    delta = submit_time - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+
+
+def _from_epoch(stamp):
+    """Microseconds since the epoch to a naive utc datetime."""
+    return _EPOCH + timedelta(microseconds=stamp)
+
+
+class Submission(Mapping):
 
     __slots__ = [
         'oj',
@@ -20,6 +48,12 @@ class Submission(Mapping, dict):
         'pid',
     ]
 
+    # Computed once so the mapping protocol does not re-read __slots__,
+    # plus a C-level getter that grabs every field as one tuple
+    _FIELDS = tuple(__slots__)
+    _KEYSET = frozenset(__slots__)
+    _GET = attrgetter(*_FIELDS)
+
     def __init__(self,
                  oj,
                  problem_id,
@@ -54,47 +88,82 @@ class Submission(Mapping, dict):
             self.timezone = submit_time.tzinfo.zone
         else:
             assert timezone is not None, 'submit_time is naive'
-            self.submit_time = pytz.utc.localize(submit_time).astimezone(pytz.timezone(timezone))
+            self.submit_time = _UTC.localize(submit_time).astimezone(_tz(timezone))
             self.timezone = timezone
         self.pid = pid
 
     def __eq__(self, other):
-        return self.values()[:-1] == other.values()[:-1]
+        return self._GET(self)[:-1] == self._GET(other)[:-1]
+
+    __hash__ = None
 
     def __getitem__(self, key):
-        try:
+        # Membership first: raising AttributeError per miss would be
+        # exception-as-control-flow on a hot dict-protocol path
+        if key in self._KEYSET:
             return getattr(self, key)
-        except AttributeError:
-            raise KeyError(key) from None
+        raise KeyError(key)
 
     def __iter__(self):
-        return iter(self.__slots__)
+        return iter(self._FIELDS)
 
     def __len__(self):
-        return len(self.__slots__)
+        return len(self._FIELDS)
 
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
-        return 'Submission({})'.format(', '.join(map(str, self.values())))
+        return 'Submission({})'.format(', '.join(str(self[k]) for k in self._FIELDS))
+
+    @classmethod
+    def _from_row(cls, oj, problem_id, problem_title, problem_url, submit_time, timezone, pid):
+        """Trusted fast path for rows as stored in the database.
+
+        Slots are assigned directly, skipping the constructor's asserts
+        and timezone branching; 'submit_time' is the stored epoch stamp.
+        """
+        self = object.__new__(cls)
+        self.oj = oj
+        self.problem_id = problem_id
+        self.problem_title = problem_title
+        self.problem_url = problem_url
+        self.submit_time = _UTC.localize(_from_epoch(submit_time)).astimezone(_tz(timezone))
+        self.timezone = timezone
+        self.pid = pid
+        return self
 
     def clone(self):
-        values = self.values()[:-2]
-        values[4] = values[4].replace()
-        return Submission(*values)
+        return Submission(self.oj,
+                          self.problem_id,
+                          self.problem_title,
+                          self.problem_url,
+                          self.submit_time)
 
     def values(self):
-        return [self[k] for k in self]
+        return self._GET(self)
 
     def items(self):
-        return [(k, self[k]) for k in self]
+        return tuple(zip(self._FIELDS, self._GET(self)))
 
 
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA busy_timeout=3000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    # WAL only makes sense for file-backed databases and may be refused,
+    # e.g. on a network filesystem, so read the resulting mode back instead
+    # of assuming the switch succeeded
+    cursor.execute("PRAGMA database_list")
+    database_file = cursor.fetchone()[2]
+    if database_file:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.fetchone()
     cursor.close()
 
 
@@ -106,9 +175,15 @@ t = Table('submissions', meta,
           Column('problem_id', String, nullable=False),
           Column('problem_title', String, nullable=False),
           Column('problem_url', String, nullable=False),
-          Column('submit_time', DateTime(False), nullable=False),
+          # Microseconds since the epoch in utc. Integers sort and compare
+          # cheaper than the ISO strings SQLite stores datetimes as
+          Column('submit_time', Integer, nullable=False),
           Column('timezone', String, nullable=False),
-          UniqueConstraint('oj', 'problem_id', name='uix_1'))
+          UniqueConstraint('oj', 'problem_id', name='uix_1'),
+          Index('ix_submit_time', 'submit_time'),
+          # Covers get_lastest_problem_id: seek on oj, walk pid backwards,
+          # and read problem_id without touching the base table
+          Index('ix_oj_pid_problem', 'oj', 'pid', 'problem_id'))
 t_milestone = Table('milestone', meta,
                     Column('pid', Integer, primary_key=True),
                     Column('handler_name', String, nullable=False),
@@ -120,46 +195,169 @@ t_login = Table('login', meta,
                 Column('user_token', String, nullable=False),
                 Column('last_modified', DateTime, default=func.now(), nullable=False))
 
+# Statements are built once at import; call sites only rebind parameters,
+# skipping the expression-tree construction and letting the compiled form
+# be reused
+_INS_SUBMISSION = t.insert().prefix_with('OR IGNORE')
+_INS_MILESTONE = t_milestone.insert()
+_INS_LOGIN = t_login.insert()
+_SEL_LATEST_PROBLEM_ID = select([t.c.problem_id]) \
+    .where(t.c.oj == bindparam('oj')) \
+    .order_by(t.c.pid.desc()) \
+    .limit(1)
+# MAX() yields a single row (NULL when the handler has no milestone), so
+# no ORDER BY/LIMIT machinery is needed for the latest-milestone lookup
+_SEL_MILESTONE_PID = select([func.max(t_milestone.c.submission_pid)]) \
+    .where(t_milestone.c.handler_name == bindparam('hdlr_name'))
+_SEL_SUBMISSIONS = select([t.c.oj,
+                           t.c.problem_id,
+                           t.c.problem_title,
+                           t.c.problem_url,
+                           t.c.submit_time,
+                           t.c.timezone,
+                           t.c.pid]) \
+    .order_by(t.c.pid)
+_SEL_SUBMISSIONS_AFTER = _SEL_SUBMISSIONS.where(t.c.pid > bindparam('after_pid'))
+_SEL_SUBMISSION_STATS = select([func.min(t.c.pid),
+                                func.max(t.c.pid),
+                                func.count(distinct(t.c.pid))])
+_SEL_SUBMISSION_STATS_AFTER = _SEL_SUBMISSION_STATS.where(t.c.pid > bindparam('after_pid'))
+_SEL_USER_TOKEN = select([t_login.c.user_token]) \
+    .where(t_login.c.website_name == bindparam('website')) \
+    .order_by(t_login.c.pid.desc()) \
+    .limit(1)
+
+
+def _set_test_pragma(dbapi_connection, connection_record):
+    # Durability does not matter under test: skip fsync entirely and keep
+    # any rollback journal in memory
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.close()
+
 
-def start_database(**kwargs):
+def start_database(testing=False, upgrade=True, **kwargs):
+    """
+    :param testing: Trade all durability for speed. Only for test runs.
+    :param upgrade: Bring a pre-existing database up to the current
+        schema. Skipped by the reset path, which drops the tables anyway.
+    """
     global engine
     if engine:
         raise RuntimeError('Database is already started')
 
     name = kwargs.pop('name', 'sms.db')
     path = kwargs.pop('path', '.')
-    url = 'sqlite:///' + os.path.join(path, name)
+    connect_args = kwargs.setdefault('connect_args', {})
+    if name == ':memory:':
+        # An in-memory database lives and dies with its connection, so a
+        # StaticPool keeps that one connection alive and hands it to every
+        # checkout. StaticPool provides no mutual exclusion, which is fine
+        # for the single-threaded test runs this case exists for
+        url = 'sqlite://'
+        kwargs.setdefault('poolclass', StaticPool)
+        connect_args.setdefault('check_same_thread', False)
+    else:
+        # File-backed databases get one long-lived connection per thread:
+        # threads sharing one physical connection would roll back each
+        # other's transactions on checkin, while SQLAlchemy's NullPool
+        # default for file urls would re-run the pragma setup and discard
+        # the pysqlite statement cache on every call
+        url = 'sqlite:///' + os.path.join(path, name)
+        kwargs.setdefault('poolclass', SingletonThreadPool)
+    # Both pools above keep connections alive between calls, so enough
+    # pysqlite-side prepared statements for every statement in this module
+    # stay parsed and planned for a connection's whole lifetime
+    connect_args.setdefault('cached_statements', 256)
     engine = create_engine(url, **kwargs)
+    if testing:
+        event.listen(engine, 'connect', _set_test_pragma)
+    # Let SQLAlchemy reuse its compiled statement forms as well
+    engine.update_execution_options(compiled_cache={})
     meta.create_all(engine)
+    if upgrade:
+        _upgrade_legacy_schema()
     return url
 
 
-def _reset_tables():
-    meta.drop_all(engine)
-    meta.create_all(engine)
-
-
-def record_submissions(subs):
+def _upgrade_legacy_schema():
+    # Databases created before submit_time became epoch microseconds hold
+    # ISO datetime strings, which _from_epoch cannot read, and create_all
+    # does not add new indexes to a pre-existing submissions table
+    existing = {ix['name'] for ix in inspect(engine).get_indexes(t.name)}
+    for index in t.indexes:
+        if index.name not in existing:
+            index.create(engine)
+
+    with engine.begin() as conn:
+        legacy = conn.execute(
+            select([t.c.pid, t.c.submit_time])
+            .where(func.typeof(t.c.submit_time) == 'text')).fetchall()
+        if not legacy:
+            return
+        rows = []
+        for pid, text in legacy:
+            try:
+                dt = datetime.fromisoformat(text)
+            except ValueError:
+                raise ValueError(
+                    'Cannot upgrade submit_time {!r} of submission {}; '
+                    'run with --reset to rebuild the database'.format(text, pid))
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(_UTC).replace(tzinfo=None)
+            rows.append({'row_pid': pid, 'epoch': _to_epoch(dt)})
+        conn.execute(t.update()
+                     .where(t.c.pid == bindparam('row_pid'))
+                     .values(submit_time=bindparam('epoch')), rows)
+
+
+def _reset_tables(bind=None, recreate=False):
+    bind = engine if bind is None else bind
+    if recreate:
+        meta.drop_all(bind)
+        meta.create_all(bind)
+        return
+    # Emptying the tables is far cheaper than dropping and rebuilding the
+    # schema plus its indexes; reversed dependency order keeps the foreign
+    # key satisfied. The tables do not use AUTOINCREMENT, so rowids restart
+    # from 1 once a table is empty
+    for table in reversed(meta.sorted_tables):
+        bind.execute(table.delete())
+
+
+def record_submissions(subs, conn=None):
     """
     :type subs: [Submission]
+    :param conn: Optional connection to run the insert on, so a caller can
+        combine it with other statements in one transaction.
     :caller: Scraper
 
     If multiple 'problem_id's exist, only the one with earliest 'submit_time'
         will be recorded.
     """
-    # Remove tzinfo. Some databases do not support timezone info in datetime
-    new_subs = []
-    for sub in subs:
-        sub = sub.clone()
-        sub.submit_time = sub.submit_time.astimezone(pytz.utc).replace(tzinfo=None)
-        new_subs.append(sub)
+    if not subs:
+        return
+
+    # Build the insert rows in one pass; cloning a Submission per row just
+    # re-ran its timezone branch for a throwaway object. Times are stored
+    # as utc because some databases do not support timezone info
+    rows = [{'oj': sub.oj,
+             'problem_id': sub.problem_id,
+             'problem_title': sub.problem_title,
+             'problem_url': sub.problem_url,
+             'submit_time': _to_epoch(sub.submit_time.astimezone(_UTC).replace(tzinfo=None)),
+             'timezone': sub.timezone}
+            for sub in subs]
 
     # Let records be a bit more ordered
-    new_subs.sort(key=lambda x: x.submit_time)
+    rows.sort(key=itemgetter('submit_time'))
 
-    ins = t.insert().prefix_with('OR IGNORE').values(new_subs)
-    with engine.connect() as conn:
-        conn.execute(ins)
+    if conn is not None:
+        conn.execute(_INS_SUBMISSION, rows)
+        return
+    with engine.begin() as conn:
+        conn.execute(_INS_SUBMISSION, rows)
 
 
 def get_lastest_problem_id(oj):
@@ -171,9 +369,8 @@ def get_lastest_problem_id(oj):
     :rtype: str
     :caller: Scraper
     """
-    s = select([t.c.problem_id]).where(t.c.oj == oj.lower()).order_by(t.c.pid.desc()).limit(1)
     with engine.connect() as conn:
-        for (problem_id,) in conn.execute(s):
+        for (problem_id,) in conn.execute(_SEL_LATEST_PROBLEM_ID, {'oj': oj.lower()}):
             return problem_id
 
 
@@ -187,9 +384,8 @@ def add_milestone(hdlr_name, milestone):
 
     Remember to call this function after successful uploading.
     """
-    ins = t_milestone.insert().values(handler_name=hdlr_name, submission_pid=milestone)
     with engine.connect() as conn:
-        conn.execute(ins)
+        conn.execute(_INS_MILESTONE, {'handler_name': hdlr_name, 'submission_pid': milestone})
 
 
 def fetch_submissions(hdlr_name=None):
@@ -205,24 +401,83 @@ def fetch_submissions(hdlr_name=None):
     :rtype: [Submission]
     :caller: Handler
     """
-    mlst = select([t_milestone.c.submission_pid, t_milestone.c.handler_name]) \
-        .where(t_milestone.c.handler_name == hdlr_name) \
-        .order_by(t_milestone.c.submission_pid.desc()).limit(1)
-    mlst = union(select([mlst]), select([None, None]).where(~exists(mlst)))
-    s = select([t.c.oj,
-                t.c.problem_id,
-                t.c.problem_title,
-                t.c.problem_url,
-                t.c.submit_time,
-                t.c.timezone,
-                t.c.pid]) \
-        .where((mlst.c.submission_pid == None) |
-               (t.c.pid > mlst.c.submission_pid) & (mlst.c.handler_name == hdlr_name)) \
-        .order_by(t.c.pid)
+    return list(iter_submissions(hdlr_name))
+
+
+def iter_submissions(hdlr_name=None):
+    """
+    Same as fetch_submissions, except that submissions are yielded one at
+    a time from a streamed cursor instead of being materialized at once.
+
+    :rtype: iterator of Submission
+    :caller: Handler
+    """
     with engine.connect() as conn:
-        return [Submission(*d) for d in conn.execute(s)]
+        milestone = _latest_milestone_pid(conn, hdlr_name) if hdlr_name else None
+        if milestone is not None:
+            s, params = _SEL_SUBMISSIONS_AFTER, {'after_pid': milestone}
+        else:
+            s, params = _SEL_SUBMISSIONS, {}
+        for d in conn.execution_options(stream_results=True).execute(s, params):
+            yield Submission._from_row(*d)
 
 
+def fetch_submission_stats(hdlr_name=None):
+    """
+    :param hdlr_name: Name of the handler that requests subsmissions.
+    :return: (min_pid, max_pid, count) of the submissions fetch_submissions
+        would return, computed in SQLite without materializing any rows.
+        All three are None/0 when there are no available submissions.
+    :rtype: (int, int, int)
+    :caller: Test
+    """
+    with engine.connect() as conn:
+        milestone = _latest_milestone_pid(conn, hdlr_name) if hdlr_name else None
+        if milestone is not None:
+            s, params = _SEL_SUBMISSION_STATS_AFTER, {'after_pid': milestone}
+        else:
+            s, params = _SEL_SUBMISSION_STATS, {}
+        return conn.execute(s, params).fetchone()
+
+
+def _latest_milestone_pid(conn, hdlr_name):
+    for (pid,) in conn.execute(_SEL_MILESTONE_PID, {'hdlr_name': hdlr_name}):
+        return pid
+
+
+def fetch_submissions_by_handlers(hdlr_names):
+    """
+    :param hdlr_names: Names of the handlers that request submissions.
+    :type hdlr_names: [str]
+    :return: Mapping from each handler name to the submissions it has not
+        handled yet, in the same order as fetch_submissions returns them.
+    :rtype: {str: [Submission]}
+    :caller: Reactor
+
+    Equivalent to calling fetch_submissions once per handler, except that
+    the submissions table is only queried once for all handlers.
+    """
+    if not hdlr_names:
+        return {}
+
+    # The IN clause grows with the handler list, so this statement cannot
+    # be prepared once at import like the others
+    mlst = select([t_milestone.c.handler_name, func.max(t_milestone.c.submission_pid)]) \
+        .where(t_milestone.c.handler_name.in_(hdlr_names)) \
+        .group_by(t_milestone.c.handler_name)
+    with engine.connect() as conn:
+        milestones = dict(conn.execute(mlst).fetchall())
+        lowest = min(milestones.get(name, 0) for name in hdlr_names)
+        if lowest > 0:
+            s, params = _SEL_SUBMISSIONS_AFTER, {'after_pid': lowest}
+        else:
+            s, params = _SEL_SUBMISSIONS, {}
+        subs = [Submission._from_row(*d) for d in conn.execute(s, params)]
+    return {name: [sub for sub in subs if sub.pid > milestones.get(name, 0)]
+            for name in hdlr_names}
+
+
+@functools.lru_cache(maxsize=32)
 def fetch_user_token(website):
     """
     :param website: name of the website to find 'user_token'
@@ -231,13 +486,11 @@ def fetch_user_token(website):
         None is returned if there does not exist such a record
     :rtype: str
     :caller: Auth
+
+    Results are cached per website until save_user_token is called.
     """
-    s = select([t_login.c.user_token]) \
-        .where(t_login.c.website_name == website) \
-        .order_by(t_login.c.pid.desc()) \
-        .limit(1)
     with engine.connect() as conn:
-        for (token,) in conn.execute(s):
+        for (token,) in conn.execute(_SEL_USER_TOKEN, {'website': website}):
             return token
 
 
@@ -248,6 +501,6 @@ def save_user_token(website, token):
     :type token: str
     :caller: Auth
     """
-    ins = t_login.insert().values(website_name=website, user_token=token)
     with engine.connect() as conn:
-        conn.execute(ins)
+        conn.execute(_INS_LOGIN, {'website_name': website, 'user_token': token})
+    fetch_user_token.cache_clear()
@@ -1,4 +1,7 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from .dbmanager import add_milestone
 from .auth import TrelloAuth
 from .utils import WebsiteSession
@@ -22,9 +25,10 @@ class HandlerMeta(type):
 
     @classmethod
     def get(mcs, name, reactor):
-        if name not in mcs.loaded:
-            mcs.loaded[name] = mcs.registered[name](reactor)
-        return mcs.loaded[name]
+        inst = mcs.loaded.get(name)
+        if inst is None:
+            inst = mcs.loaded[name] = mcs.registered[name](reactor)
+        return inst
 
 build_handler = HandlerMeta.get
 
@@ -60,6 +64,7 @@ class TrelloHandler(BaseHandler):
         'target_list_name': None,
     }
     API_URL = 'https://api.trello.com/1'
+    MAX_UPLOADS_IN_FLIGHT = 8
 
     def init(self):
         assert all(k in self.options for k in ('target_board_name', 'target_list_name')), \
@@ -68,6 +73,12 @@ class TrelloHandler(BaseHandler):
         self.me_id = None
         self.labels = None
         self.auth = TrelloAuth(self)
+        # One session for the handler's lifetime, so uploads after the
+        # first reuse established connections instead of renegotiating TLS
+        self.session = WebsiteSession(self.API_URL, self.auth, self.auth.init_user_token)
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=4, pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.2)))
 
     def upload(self, submissions):
         """
@@ -75,35 +86,53 @@ class TrelloHandler(BaseHandler):
         """
         done = 0
         try:
-            with WebsiteSession(self.API_URL, self.auth, self.auth.init_user_token) as s:
-                if self.list_id is None:
-                    self.me_id = s.json('/member/me')['id']
-
-                    boards = s.json('/member/me/boards')
-                    board_id = self.find_id_by_name(boards, self.options['target_board_name'])
-
-                    NAME_ONLY = {'field': 'name'}
-                    labels = s.json('/boards/{}/labels'.format(board_id), params=NAME_ONLY)
-                    self.labels = {d['name'].lower(): d['id'] for d in labels}
-
-                    lists = s.json('/boards/{}/lists'.format(board_id), params=NAME_ONLY)
-                    self.list_id = self.find_id_by_name(lists, self.options['target_list_name'])
-
-                # TODO check duplications
-                for sub in submissions:
-                    time_format = self.options.get('submit_time_format',
-                                                   self.reactor.options['submit_time_format'])
-                    date = sub.submit_time.strftime(time_format)
-                    s.post('/cards', params={
-                        'idList': self.list_id,
-                        'name': '{}. {}'.format(sub.problem_id, sub.problem_title),
-                        'desc': '{}\n-- Accepted on {}'.format(sub.problem_url, date),
-                        'pos': 'top',
-                        'due': None,
-                        'idLabels': self.labels.get(sub.oj, ''),
-                        'idMembers': self.me_id,
-                    })
-                    done += 1
+            s = self.session
+            if self.list_id is None:
+                self.me_id = s.json('/member/me')['id']
+
+                boards = s.json('/member/me/boards')
+                board_ids = {d['name']: d['id'] for d in boards}
+                board_id = board_ids[self.options['target_board_name']]
+
+                NAME_ONLY = {'field': 'name'}
+                labels = s.json('/boards/{}/labels'.format(board_id), params=NAME_ONLY)
+                self.labels = {d['name'].lower(): d['id'] for d in labels}
+
+                lists = s.json('/boards/{}/lists'.format(board_id), params=NAME_ONLY)
+                list_ids = {d['name']: d['id'] for d in lists}
+                self.list_id = list_ids[self.options['target_list_name']]
+
+            time_format = self.options.get('submit_time_format',
+                                           self.reactor.options['submit_time_format'])
+            name_fmt = '%s. %s'
+            desc_fmt = '%s\n-- Accepted on %s'
+
+            def post_card(sub):
+                s.post('/cards', params={
+                    'idList': self.list_id,
+                    'name': name_fmt % (sub.problem_id, sub.problem_title),
+                    'desc': desc_fmt % (sub.problem_url,
+                                        sub.submit_time.strftime(time_format)),
+                    'pos': 'top',
+                    'due': None,
+                    'idLabels': self.labels.get(sub.oj, ''),
+                    'idMembers': self.me_id,
+                })
+
+            if not submissions:
+                return
+
+            # TODO check duplications
+            # Cards are posted concurrently, but 'done' only counts the
+            # successes consecutive from the start so the milestone still
+            # marks the last submission with no failure before it
+            workers = min(self.MAX_UPLOADS_IN_FLIGHT, len(submissions))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(post_card, sub) for sub in submissions]
+            for future in futures:
+                if future.exception() is not None:
+                    raise future.exception()
+                done += 1
 
         except KeyError as e:
             raise ValueError('Target name not found on Trello: {}'.format(e)) from None
@@ -111,10 +140,3 @@ class TrelloHandler(BaseHandler):
             if done > 0:
                 add_milestone(self.name,
                               submissions[done - 1].pid)
-
-    @classmethod
-    def find_id_by_name(cls, items, name):
-        for d in items:
-            if d['name'] == name:
-                return d['id']
-        raise KeyError(name)
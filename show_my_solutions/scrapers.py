@@ -1,6 +1,11 @@
 import logging
 import itertools
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import pytz
+from bs4 import SoupStrainer
 from parsedatetime import Calendar
 from tzlocal import get_localzone
 from .dbmanager import get_lastest_problem_id, Submission
@@ -8,6 +13,33 @@ from .utils import WebsiteSession
 
 LOGGER = logging.getLogger(__name__)
 
+_AGO_RE = re.compile(r'(\d+)\s+(second|minute|hour|day|week|month|year)s?')
+_AGO_UNITS = {
+    'second': timedelta(seconds=1),
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30),
+    'year': timedelta(days=365),
+}
+
+
+def parse_ago(text, now):
+    """Fast path for relative times like '1 week, 2 days' in place of
+    parsedatetime, which rebuilds its parsing state on every call.
+
+    :param now: Reference time, sampled once per fetch by the caller.
+    :return: datetime, or None if the text does not look like a relative time
+    """
+    matches = _AGO_RE.findall(text)
+    if not matches:
+        return None
+    total = timedelta()
+    for n, unit in matches:
+        total += _AGO_UNITS[unit] * int(n)
+    return now - total
+
 
 class ScraperMeta(type):
 
@@ -25,9 +57,10 @@ class ScraperMeta(type):
 
     @classmethod
     def get(mcs, name, reactor):
-        if name not in mcs.loaded:
-            mcs.loaded[name] = mcs.registered[name](reactor)
-        return mcs.loaded[name]
+        inst = mcs.loaded.get(name)
+        if inst is None:
+            inst = mcs.loaded[name] = mcs.registered[name](reactor)
+        return inst
 
 build_scraper = ScraperMeta.get
 
@@ -107,8 +140,10 @@ class LeetCodeScraper(BaseScraper):
         return True
 
     def fetch(self):
-        # Fetch a list of all accepted submissions
-        main_soup = self.session.soup('/problemset/algorithms/')
+        # Fetch a list of all accepted submissions. Only the problem table
+        # is parsed into a tree; the page around it is thrown away
+        main_soup = self.session.soup('/problemset/algorithms/',
+                                      parse_only=SoupStrainer(id='problemList'))
         ac_dict = {}
         for row in main_soup.select('#problemList > tbody > tr'):
             ac, prob_id, title_path, _, _, _, _ = row('td')
@@ -127,31 +162,46 @@ class LeetCodeScraper(BaseScraper):
                 words[i] += ' ago'
             return ','.join(words)
 
+        now = datetime.now(self.tzinfo)
         return [
             Submission(self.name,
                        prob_id.string,
                        title.string,
                        self.session(path),
+                       parse_ago(ago.string, now) or
                        self.parse_datetime(normalize_time(ago.string)))
             for path, (prob_id, title, ago) in ac_dict.items() if ago is not None
         ]
 
+    PREFETCH_PAGES = 4
+
     def fetch_submit_times_by(self, ac_dict, latest_id=None):
-        for i in itertools.count(1):
-            sub_soup = self.session.soup('/submissions/{}'.format(i))
-            rows = sub_soup.select('#result-testcases > tbody > tr')
-            if not rows:
-                if i == 1:
-                    LOGGER.warning('Not found any submissions at all')
-                break
-            for row in rows:
-                ago, title_path, status, _, _ = row('td')
-                if 'status-accepted' not in status.a['class']:
-                    continue
-                sub = ac_dict[title_path.a['href']]
-                if sub[0].string == latest_id:
-                    return
-                sub[-1] = ago
+        # Pages are fetched a few ahead of the one being parsed; rows are
+        # still consumed strictly in page order so the latest_id sentinel
+        # keeps its meaning. A few pages past the stop point may be fetched
+        # for nothing, which is cheaper than serializing every request
+        pages = itertools.count(1)
+        with ThreadPoolExecutor(max_workers=self.PREFETCH_PAGES) as executor:
+            fetch_page = lambda: executor.submit(
+                self.session.soup, '/submissions/{}'.format(next(pages)),
+                parse_only=SoupStrainer(id='result-testcases'))
+            prefetched = deque(fetch_page() for _ in range(self.PREFETCH_PAGES))
+            for i in itertools.count(1):
+                sub_soup = prefetched.popleft().result()
+                rows = sub_soup.select('#result-testcases > tbody > tr')
+                if not rows:
+                    if i == 1:
+                        LOGGER.warning('Not found any submissions at all')
+                    break
+                prefetched.append(fetch_page())
+                for row in rows:
+                    ago, title_path, status, _, _ = row('td')
+                    if 'status-accepted' not in status.a['class']:
+                        continue
+                    sub = ac_dict[title_path.a['href']]
+                    if sub[0].string == latest_id:
+                        return
+                    sub[-1] = ago
 
 
 class POJScraper(BaseScraper):
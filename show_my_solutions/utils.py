@@ -1,10 +1,19 @@
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from . import __title__ as title, __version__ as version
 
 LOGGER = logging.getLogger(__name__)
 
+# The C-backed lxml parser is several times faster on the large pages some
+# judges serve; fall back to the stdlib parser when it is not installed
+try:
+    import lxml  # noqa
+    SOUP_PARSER = 'lxml'
+except ImportError:
+    SOUP_PARSER = 'html.parser'
+
 
 class WebsiteSession(requests.Session):
 
@@ -16,6 +25,11 @@ class WebsiteSession(requests.Session):
         """
         super().__init__()
         self.prefix = prefix
+        # Keep enough connections alive that every request to the host
+        # reuses an established one instead of renegotiating TLS
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
         if auth:
             self.auth = auth
         self.headers.update({
@@ -48,9 +62,16 @@ class WebsiteSession(requests.Session):
 
         return r
 
-    def soup(self, *args, **kwargs):
+    def soup(self, *args, parse_only=None, **kwargs):
+        """
+        :param parse_only: optional SoupStrainer so only the interesting
+            part of a large page is turned into a tree
+        """
         r = self.get(*args, **kwargs)
-        return BeautifulSoup(r.text, 'html.parser')
+        if SOUP_PARSER == 'lxml':
+            # lxml decodes the raw bytes itself, skipping a round through str
+            return BeautifulSoup(r.content, SOUP_PARSER, parse_only=parse_only)
+        return BeautifulSoup(r.text, SOUP_PARSER, parse_only=parse_only)
 
     def json(self, *args, **kwargs):
         return self.get(*args, **kwargs).json()
@@ -7,43 +7,48 @@ from show_my_solutions.dbmanager import Submission
 
 
 OJS = ['POJ', 'LeetCode', 'Codeforces', 'TopCoder', 'HackerRank', 'ACM']
+# Lowercasing and re-parsing the url template per generated row adds up
+_URL_FMTS = {oj: oj.lower() + '.com/test_{}.html' for oj in OJS}
 MAX_ROW = 100
 
 LOGGER = logging.getLogger(__name__)
 
 
-def setup_module(module):
-    from show_my_solutions.dbmanager import start_database
-    start_database(name='sms_test.db', echo=False)
-
-
-def gen_sub(oj, problem_id, seconddelta=None):
-    seconddelta = random.randint(-1e6, 1e6) if seconddelta is None else seconddelta
+def gen_sub(oj, problem_id, seconddelta=None, now=None):
+    seconddelta = random.randint(-10**6, 10**6) if seconddelta is None else seconddelta
+    now = datetime.now(pytz.utc) if now is None else now
     return Submission(oj,
                       problem_id,
                       'Test {}'.format(random.randint(0, MAX_ROW)),
-                      '{}.com/test_{}.html'.format(oj.lower(), problem_id),
-                      datetime.now(pytz.utc) + timedelta(seconds=seconddelta))
+                      _URL_FMTS[oj].format(problem_id),
+                      now + timedelta(seconds=seconddelta))
 
 
 def gen_rand_subs(n=MAX_ROW, sort=False):
-    data = [gen_sub(random.choice(OJS), str(i)) for i in range(n)]
+    # One clock read and one RNG call cover the whole batch
+    now = datetime.now(pytz.utc)
+    deltas = random.choices(range(-10**6, 10**6), k=n)
+    ojs = random.choices(OJS, k=n)
+    data = [gen_sub(oj, str(i), d, now) for i, (oj, d) in enumerate(zip(ojs, deltas))]
     if sort:
         data.sort(key=lambda x: x.submit_time)
     return data
 
 
 def refill_submissions(data=None):
-    from show_my_solutions.dbmanager import record_submissions, _reset_tables
+    from show_my_solutions.dbmanager import engine, record_submissions, _reset_tables
 
-    _reset_tables()
     if data is None:
         data = gen_rand_subs()
-    record_submissions(data)
+    # Reset and refill in one transaction so the fixture pays one commit
+    with engine.begin() as conn:
+        _reset_tables(conn)
+        record_submissions(data, conn=conn)
     return data
 
 
-def test_record():
+@pytest.mark.parametrize('n', [100, 10000])
+def test_record(n):
     from show_my_solutions.dbmanager import (fetch_submissions, record_submissions)
 
     def compare(data):
@@ -55,13 +60,16 @@ def test_record():
             d.oj = d.oj.lower()
         assert data == result
 
-    data = refill_submissions()
+    data = refill_submissions(gen_rand_subs(n))
     compare(data)
 
-    # Test duplicated (oj, problem_id)
-    new_sub = gen_sub(OJS[0], '-1')
+    # Test duplicated (oj, problem_id): recording on top of the existing
+    # rows exercises the OR IGNORE dedup without resetting and re-inserting
+    # the whole table. The submit_time is pushed past every generated row
+    # so the expected ordering stays aligned with the assigned pids
+    new_sub = gen_sub(OJS[0], '-1', seconddelta=2 * 10**6)
     data.extend([new_sub, new_sub])
-    refill_submissions(data)
+    record_submissions([new_sub, new_sub])
     compare(data)
 
     # Record empty list
@@ -69,27 +77,29 @@ def test_record():
     compare([])
 
 
-def test_milestone():
+@pytest.mark.parametrize('n', [100, 10000])
+def test_milestone(n):
     from sqlalchemy.exc import IntegrityError
-    from show_my_solutions.dbmanager import fetch_submissions, add_milestone
+    from show_my_solutions.dbmanager import fetch_submission_stats, add_milestone
 
-    data = [gen_sub(OJS[0], str(i), i) for i in range(MAX_ROW)]
+    data = [gen_sub(OJS[0], str(i), i) for i in range(n)]
     refill_submissions(data)
 
-    ms = MAX_ROW / 2
+    ms = n / 2
     add_milestone('rand_tester', ms)
-    result = fetch_submissions('rand_tester')
-    pids = [x.pid for x in result]
-    assert min(pids) == ms + 1
-    assert len(set(pids)) == MAX_ROW - ms
-    assert max(pids) == MAX_ROW
+    # Min/max/count are computed in SQLite, which asserts the same bounds
+    # without hydrating every remaining row into a Submission
+    min_pid, max_pid, count = fetch_submission_stats('rand_tester')
+    assert min_pid == ms + 1
+    assert count == n - ms
+    assert max_pid == n
 
     # Out-of-bound milestone should not take effect because of forigen key
     with pytest.raises(IntegrityError):
-        add_milestone('rand_tester', MAX_ROW + 1)
+        add_milestone('rand_tester', n + 1)
 
-    add_milestone('rand_tester', MAX_ROW)
-    assert fetch_submissions('rand_tester') == []
+    add_milestone('rand_tester', n)
+    assert fetch_submission_stats('rand_tester') == (None, None, 0)
 
 
 def test_latest_problem_id():
@@ -102,9 +112,8 @@ def test_latest_problem_id():
 
     latest = {}
     data = []
-    for i in range(MAX_ROW):
-        oj = random.choice(OJS)
-        problem_id = str(random.randint(0, 1e5))
+    for i, oj in enumerate(random.choices(OJS, k=MAX_ROW)):
+        problem_id = str(random.randint(0, 10**5))
         latest[oj] = problem_id
         data.append(gen_sub(oj, problem_id, i))
     record_submissions(data)
@@ -113,12 +122,6 @@ def test_latest_problem_id():
         assert get_lastest_problem_id(oj) == latest.get(oj, None)
 
 
-@pytest.fixture
-def reactor():
-    from show_my_solutions.app import get_config, Reactor
-    return Reactor(get_config())
-
-
 @pytest.mark.skip
 def test_trello_handler(reactor):
     from show_my_solutions.handlers import build_handler